@@ -4,14 +4,20 @@ Defines endpoints for querying, logging, and health checks.
 """
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from cachetools import TTLCache
+from collections import namedtuple
 from typing import List
+import hashlib
+import json
+import numpy as np
 import time
 import logging
 
 from app.models.schemas import QueryRequest, QueryResponse, InteractionLog, HealthResponse
 from app.services.embeddings import EmbeddingService
 from app.services.retrieval import FAQRetriever
-from app.services.generation import AnswerGenerator
+from app.services.generation import AnswerGenerator, FallbackAnswer
 from app.models.database import Database
 from app.config import get_settings
 
@@ -24,66 +30,115 @@ faq_retriever: FAQRetriever = None
 answer_generator: AnswerGenerator = None
 database: Database = None
 
+# Search settings resolved once at startup so the hot path avoids
+# per-request get_settings() calls and attribute lookups
+SearchConfig = namedtuple("SearchConfig", ["top_k", "threshold", "openai_configured"])
+_search_cfg: SearchConfig = None
+
+
+# Cache of (retrieved_faqs, answer) keyed on the quantized query embedding,
+# so repeat queries skip both the Qdrant search and the LLM call
+_answer_cache: TTLCache = TTLCache(maxsize=512, ttl=300)
+
+
+def _answer_cache_key(query_embedding: List[float]) -> bytes:
+    """
+    Hash the query embedding into a cache key. The vector is quantized to
+    int8 first so near-identical embeddings of the same query map to the
+    same key.
+    """
+    quantized = np.round(np.asarray(query_embedding) * 127).astype(np.int8)
+    return hashlib.blake2b(quantized.tobytes(), digest_size=16).digest()
+
+
+def clear_answer_cache():
+    """Drop cached answers (called after FAQs are reindexed)"""
+    _answer_cache.clear()
+
 
 def set_services(embedding, retrieval, generation, db):
     """
     Initialize route-level service instances.
     Called from main.py after services are created.
     """
-    global embedding_service, faq_retriever, answer_generator, database
+    global embedding_service, faq_retriever, answer_generator, database, _search_cfg
     embedding_service = embedding
     faq_retriever = retrieval
     answer_generator = generation
     database = db
 
+    settings = get_settings()
+    _search_cfg = SearchConfig(
+        top_k=settings.top_k_results,
+        threshold=settings.similarity_threshold,
+        openai_configured=bool(settings.openai_api_key)
+    )
+
 
 @router.post("/ask", response_model=QueryResponse)
 async def ask_question(request: QueryRequest):
     """
     Main Q&A endpoint: accepts a question and returns AI-generated answer.
-    
+
     Process:
     1. Generate embedding for user query
     2. Search vector database for similar FAQs
     3. Generate contextualized answer using LLM
     4. Log the interaction
     5. Return response with sources
+
+    Ordering: steps 1-3 form a strict dependency chain (each consumes the
+    previous step's output), so they cannot overlap within one request.
+    Everything independent of the response body runs off this path: the
+    interaction log is queued for a background writer, and prompt
+    scaffolding is prebuilt at service init rather than per request.
     """
-    start_time = time.time()
-    
+    start_ns = time.perf_counter_ns()
+
     try:
         logger.info(f"Received query: {request.query[:100]}...")
-        
+
         # Step 1: Generate query embedding
         query_embedding = await embedding_service.generate_embedding(request.query)
-        
-        # Step 2: Retrieve relevant FAQs
-        settings = get_settings()
-        retrieved_faqs = await faq_retriever.search(
-            query_embedding=query_embedding,
-            top_k=settings.top_k_results,
-            score_threshold=settings.similarity_threshold
-        )
-        
-        # Check if we found relevant FAQs
-        if not retrieved_faqs:
-            logger.warning("No relevant FAQs found above threshold")
-            answer = (
-                "I couldn't find any relevant information in our FAQ database for your question. "
-                "This might be outside the scope of our current knowledge base. "
-                "Please consider rephrasing your question or consulting with a legal professional directly."
-            )
-            sources = []
+
+        # Steps 2-3: Retrieve FAQs and generate answer, unless an identical
+        # query was answered recently and is still cached
+        cache_key = _answer_cache_key(query_embedding)
+        cached = _answer_cache.get(cache_key)
+        if cached is not None:
+            retrieved_faqs, answer = cached
+            logger.info("Answer cache hit - skipping retrieval and generation")
         else:
-            # Step 3: Generate AI answer
-            answer = await answer_generator.generate_answer(request.query, retrieved_faqs)
-            sources = retrieved_faqs if request.include_sources else []
+            retrieved_faqs = await faq_retriever.search(
+                query_embedding=query_embedding,
+                top_k=_search_cfg.top_k,
+                score_threshold=_search_cfg.threshold
+            )
+
+            # Check if we found relevant FAQs
+            if not retrieved_faqs:
+                logger.warning("No relevant FAQs found above threshold")
+                answer = (
+                    "I couldn't find any relevant information in our FAQ database for your question. "
+                    "This might be outside the scope of our current knowledge base. "
+                    "Please consider rephrasing your question or consulting with a legal professional directly."
+                )
+            else:
+                # Step 3: Generate AI answer
+                answer = await answer_generator.generate_answer(request.query, retrieved_faqs)
+
+            # Don't cache fallback output: a transient API blip shouldn't
+            # poison repeats of this query for the whole TTL
+            if not isinstance(answer, FallbackAnswer):
+                _answer_cache[cache_key] = (retrieved_faqs, answer)
+
+        sources = retrieved_faqs if (retrieved_faqs and request.include_sources) else []
         
         # Calculate response time
-        response_time_ms = int((time.time() - start_time) * 1000)
+        response_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
         
-        # Step 4: Log interaction
-        await database.log_interaction(
+        # Step 4: Queue interaction log (written off the request path)
+        database.enqueue_log(
             user_query=request.query,
             retrieved_faq_ids=[faq.faq_id for faq in retrieved_faqs],
             ai_response=answer,
@@ -103,11 +158,11 @@ async def ask_question(request: QueryRequest):
         
     except Exception as e:
         # Log error
-        response_time_ms = int((time.time() - start_time) * 1000)
+        response_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         
         try:
-            await database.log_interaction(
+            database.enqueue_log(
                 user_query=request.query,
                 retrieved_faq_ids=[],
                 ai_response=f"Error: {str(e)}",
@@ -124,6 +179,75 @@ async def ask_question(request: QueryRequest):
         )
 
 
+@router.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    """
+    Streaming variant of /ask: forwards answer tokens to the client as
+    Server-Sent Events while the LLM generates them.
+
+    Each token is sent as a `data:` event with a JSON payload; a final
+    event carries the sources and timing, followed by `data: [DONE]`.
+    The full answer is buffered alongside streaming so the interaction
+    is logged once generation completes.
+    """
+    start_ns = time.perf_counter_ns()
+
+    logger.info(f"Received streaming query: {request.query[:100]}...")
+
+    # Embed and retrieve before opening the stream so errors here still
+    # surface as normal HTTP errors rather than a broken event stream.
+    try:
+        query_embedding = await embedding_service.generate_embedding(request.query)
+        retrieved_faqs = await faq_retriever.search(
+            query_embedding=query_embedding,
+            top_k=_search_cfg.top_k,
+            score_threshold=_search_cfg.threshold
+        )
+    except Exception as e:
+        logger.error(f"Error preparing streaming query: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your question. Please try again."
+        )
+
+    async def event_stream():
+        answer_parts = []
+
+        if not retrieved_faqs:
+            fallback = (
+                "I couldn't find any relevant information in our FAQ database for your question. "
+                "This might be outside the scope of our current knowledge base. "
+                "Please consider rephrasing your question or consulting with a legal professional directly."
+            )
+            answer_parts.append(fallback)
+            yield f"data: {json.dumps({'token': fallback})}\n\n"
+        else:
+            async for token in answer_generator.generate_answer_stream(request.query, retrieved_faqs):
+                answer_parts.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+
+        response_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        sources = retrieved_faqs if request.include_sources else []
+        final_event = {
+            "sources": [faq.model_dump() for faq in sources],
+            "response_time_ms": response_time_ms
+        }
+        yield f"data: {json.dumps(final_event)}\n\n"
+        yield "data: [DONE]\n\n"
+
+        database.enqueue_log(
+            user_query=request.query,
+            retrieved_faq_ids=[faq.faq_id for faq in retrieved_faqs],
+            ai_response="".join(answer_parts),
+            response_time_ms=response_time_ms,
+            relevance_scores=[faq.similarity_score for faq in retrieved_faqs],
+            error_occurred=False
+        )
+        logger.info(f"Streamed answer in {response_time_ms}ms")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/logs", response_model=List[dict])
 async def get_interaction_logs(limit: int = 50):
     """
@@ -157,7 +281,7 @@ async def get_statistics():
     """
     try:
         stats = await database.get_stats()
-        stats["faqs_in_database"] = faq_retriever.get_faq_count()
+        stats["faqs_in_database"] = await faq_retriever.get_faq_count()
         return stats
     except Exception as e:
         logger.error(f"Error retrieving stats: {str(e)}")
@@ -175,12 +299,11 @@ async def health_check():
     """
     try:
         # Check Qdrant connection
-        faq_count = faq_retriever.get_faq_count()
+        faq_count = await faq_retriever.get_faq_count()
         qdrant_connected = faq_count >= 0
         
         # Check OpenAI configuration
-        settings = get_settings()
-        openai_configured = bool(settings.openai_api_key)
+        openai_configured = _search_cfg.openai_configured
         
         status = "healthy" if (qdrant_connected and openai_configured) else "degraded"
         
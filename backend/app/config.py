@@ -17,11 +17,15 @@ class Settings(BaseSettings):
     llm_model: str = "gpt-4-turbo-preview"
     llm_temperature: float = 0.7
     max_tokens: int = 500
+    embedding_max_batch: int = 64  # Max queries coalesced into one embedding call
+    embedding_batch_wait_ms: int = 10  # How long to wait for more queries to batch
     
     # Qdrant Configuration
     qdrant_host: str = "qdrant"
     qdrant_port: int = 6333
+    qdrant_grpc_port: int = 6334
     qdrant_collection_name: str = "legal_faqs"
+    qdrant_quantization: str = "int8"  # Vector quantization mode: none, int8, or binary
     
     # Retrieval Configuration
     top_k_results: int = 2
@@ -5,8 +5,12 @@ Initializes services, loads FAQs, and configures the API server.
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+import hashlib
+import httpx
 import json
 import logging
+import numpy as np
 from pathlib import Path
 
 from app.config import get_settings
@@ -24,11 +28,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Shared HTTP client for all OpenAI traffic (created on startup): HTTP/2
+# multiplexes concurrent embedding and chat calls over one TLS connection
+_openai_http_client: httpx.AsyncClient = None
+
 # Create FastAPI app
 app = FastAPI(
     title="Legal Q&A RAG System",
     description="Retrieval-Augmented Generation system for legal FAQs",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for frontend access
@@ -47,20 +56,31 @@ async def startup_event():
     Initialize all services and load FAQ data on application startup.
     This runs once when the server starts.
     """
+    global _openai_http_client
     logger.info("Starting application initialization...")
     settings = get_settings()
-    
+
     try:
         # Initialize database
         logger.info("Initializing database...")
         db = Database(db_path="data/interactions.db")
         await db.initialize()
-        
+
+        # Shared connection pool for both OpenAI-backed services
+        _openai_http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+
         # Initialize services
         logger.info("Initializing embedding service...")
         embedding_service = EmbeddingService(
             api_key=settings.openai_api_key,
-            model=settings.embedding_model
+            model=settings.embedding_model,
+            max_batch=settings.embedding_max_batch,
+            batch_wait_ms=settings.embedding_batch_wait_ms,
+            http_client=_openai_http_client
         )
         
         logger.info("Initializing FAQ retriever...")
@@ -68,7 +88,9 @@ async def startup_event():
             host=settings.qdrant_host,
             port=settings.qdrant_port,
             collection_name=settings.qdrant_collection_name,
-            embedding_dimension=settings.embedding_dimension
+            embedding_dimension=settings.embedding_dimension,
+            grpc_port=settings.qdrant_grpc_port,
+            quantization=settings.qdrant_quantization
         )
         await faq_retriever.initialize_collection()
         
@@ -77,29 +99,43 @@ async def startup_event():
             api_key=settings.openai_api_key,
             model=settings.llm_model,
             temperature=settings.llm_temperature,
-            max_tokens=settings.max_tokens
+            max_tokens=settings.max_tokens,
+            http_client=_openai_http_client
         )
         
         # Load and index FAQs if collection is empty
-        faq_count = faq_retriever.get_faq_count()
+        faq_count = await faq_retriever.get_faq_count()
         if faq_count == 0:
             logger.info("Loading FAQs from JSON file...")
             faq_data_path = Path(__file__).parent / "data" / "legal_faqs.json"
-            
-            with open(faq_data_path, "r") as f:
-                faq_data = json.load(f)
-            
+
+            faq_bytes = faq_data_path.read_bytes()
+            faq_data = json.loads(faq_bytes)
+
             faqs = [FAQ(**faq) for faq in faq_data["faqs"]]
             logger.info(f"Loaded {len(faqs)} FAQs")
-            
-            # Generate embeddings for all FAQ questions
-            logger.info("Generating embeddings for FAQs...")
-            questions = [faq.question for faq in faqs]
-            embeddings = await embedding_service.generate_embeddings_batch(questions)
+
+            # Reuse embeddings persisted from a previous startup when the
+            # FAQ file is unchanged (keyed by its content hash), so
+            # redeploys skip the OpenAI batch call entirely
+            faq_hash = hashlib.sha256(faq_bytes).hexdigest()[:16]
+            embeddings_cache_path = Path("data") / f"embeddings-{faq_hash}.npy"
+
+            if embeddings_cache_path.exists():
+                logger.info(f"Loading cached FAQ embeddings from {embeddings_cache_path}")
+                embeddings = np.load(embeddings_cache_path)
+            else:
+                logger.info("Generating embeddings for FAQs...")
+                questions = [faq.question for faq in faqs]
+                embeddings = await embedding_service.generate_embeddings_batch(questions)
+                embeddings_cache_path.parent.mkdir(parents=True, exist_ok=True)
+                np.save(embeddings_cache_path, embeddings)
+                logger.info(f"Cached FAQ embeddings to {embeddings_cache_path}")
             
             # Index FAQs in Qdrant
             logger.info("Indexing FAQs in vector database...")
             await faq_retriever.index_faqs(faqs, embeddings)
+            routes.clear_answer_cache()
             logger.info("FAQ indexing complete!")
         else:
             logger.info(f"FAQs already loaded: {faq_count} entries found")
@@ -114,6 +150,16 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources when the server stops."""
+    if routes.database is not None:
+        await routes.database.close()
+    if _openai_http_client is not None:
+        await _openai_http_client.aclose()
+    logger.info("Application shutdown complete")
+
+
 # Include API routes
 app.include_router(routes.router)
 
@@ -131,9 +177,15 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
+
+    # Dev entrypoint only; production runs via the Dockerfile CMD with
+    # multiple workers, uvloop, and httptools
+    settings = get_settings()
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=settings.environment == "development",
+        loop="uvloop",
+        http="httptools"
     )
@@ -4,36 +4,127 @@ Uses aiosqlite for async database operations.
 """
 
 import aiosqlite
-import json
+import asyncio
+import logging
+import orjson
 from typing import List, Optional
 from datetime import datetime
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+_INSERT_INTERACTION_SQL = """
+    INSERT INTO interactions (
+        user_query, retrieved_faq_ids, ai_response,
+        response_time_ms, relevance_scores, error_occurred
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
 
 class Database:
     """Manages SQLite database for interaction logging"""
-    
+
     def __init__(self, db_path: str = "data/interactions.db"):
         self.db_path = db_path
+        self._db: Optional[aiosqlite.Connection] = None
+        # Queue of pending log rows drained by a background writer task,
+        # so request handlers never wait on a SQLite commit.
+        self._log_queue: asyncio.Queue = asyncio.Queue()
+        self._log_writer_task: Optional[asyncio.Task] = None
         # Ensure data directory exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    
+
     async def initialize(self):
-        """Create interactions table if it doesn't exist"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS interactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    user_query TEXT NOT NULL,
-                    retrieved_faq_ids TEXT NOT NULL,
-                    ai_response TEXT NOT NULL,
-                    response_time_ms INTEGER NOT NULL,
-                    relevance_scores TEXT NOT NULL,
-                    error_occurred BOOLEAN DEFAULT FALSE
-                )
-            """)
-            await db.commit()
+        """
+        Open a single long-lived connection and create the interactions
+        table if it doesn't exist. WAL mode with NORMAL synchronous avoids
+        per-write journal setup and fsync cost on the request hot path.
+        """
+        self._db = await aiosqlite.connect(self.db_path)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.execute("PRAGMA temp_store=MEMORY")
+        await self._db.execute("""
+            CREATE TABLE IF NOT EXISTS interactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                user_query TEXT NOT NULL,
+                retrieved_faq_ids TEXT NOT NULL,
+                ai_response TEXT NOT NULL,
+                response_time_ms INTEGER NOT NULL,
+                relevance_scores TEXT NOT NULL,
+                error_occurred BOOLEAN DEFAULT FALSE
+            )
+        """)
+        # Indexes keep get_logs at O(log N + limit) and error lookups cheap
+        # as the table grows
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_interactions_ts
+            ON interactions(timestamp DESC)
+        """)
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_interactions_err
+            ON interactions(error_occurred) WHERE error_occurred = 1
+        """)
+        await self._db.commit()
+        self._log_writer_task = asyncio.create_task(self._log_writer())
+
+    async def _log_writer(self):
+        """
+        Background loop that drains queued log rows and inserts them.
+        Multiple pending rows are written in one executemany + commit, so
+        fsync cost is amortized across bursts of traffic.
+        """
+        while True:
+            rows = [await self._log_queue.get()]
+            while not self._log_queue.empty():
+                rows.append(self._log_queue.get_nowait())
+            try:
+                await self._db.executemany(_INSERT_INTERACTION_SQL, rows)
+                await self._db.commit()
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} interaction logs: {str(e)}")
+
+    async def _flush_logs(self):
+        """Write any rows still queued (used during shutdown)"""
+        rows = []
+        while not self._log_queue.empty():
+            rows.append(self._log_queue.get_nowait())
+        if rows:
+            await self._db.executemany(_INSERT_INTERACTION_SQL, rows)
+            await self._db.commit()
+
+    async def close(self):
+        """Close the shared connection (called on application shutdown)"""
+        if self._log_writer_task is not None:
+            self._log_writer_task.cancel()
+            self._log_writer_task = None
+        if self._db is not None:
+            await self._flush_logs()
+            await self._db.close()
+            self._db = None
+
+    def enqueue_log(
+        self,
+        user_query: str,
+        retrieved_faq_ids: List[str],
+        ai_response: str,
+        response_time_ms: int,
+        relevance_scores: List[float],
+        error_occurred: bool = False
+    ):
+        """
+        Queue an interaction log entry for the background writer.
+        Returns immediately without waiting for the database commit.
+        """
+        self._log_queue.put_nowait((
+            user_query,
+            orjson.dumps(retrieved_faq_ids).decode(),
+            ai_response,
+            response_time_ms,
+            orjson.dumps(relevance_scores).decode(),
+            error_occurred
+        ))
     
     async def log_interaction(
         self,
@@ -48,51 +139,47 @@ class Database:
         Insert a new interaction log entry.
         Returns the ID of the inserted row.
         """
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("""
-                INSERT INTO interactions (
-                    user_query, retrieved_faq_ids, ai_response, 
-                    response_time_ms, relevance_scores, error_occurred
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                user_query,
-                json.dumps(retrieved_faq_ids),
-                ai_response,
-                response_time_ms,
-                json.dumps(relevance_scores),
-                error_occurred
-            ))
-            await db.commit()
-            return cursor.lastrowid
+        cursor = await self._db.execute(_INSERT_INTERACTION_SQL, (
+            user_query,
+            orjson.dumps(retrieved_faq_ids).decode(),
+            ai_response,
+            response_time_ms,
+            orjson.dumps(relevance_scores).decode(),
+            error_occurred
+        ))
+        await self._db.commit()
+        return cursor.lastrowid
     
     async def get_logs(self, limit: int = 100) -> List[dict]:
         """
         Retrieve recent interaction logs.
         Returns list of log entries ordered by most recent first.
         """
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM interactions 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (limit,)) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+        self._db.row_factory = aiosqlite.Row
+        async with self._db.execute("""
+            SELECT * FROM interactions
+            ORDER BY timestamp DESC
+            LIMIT ?
+        """, (limit,)) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
     
     async def get_stats(self) -> dict:
-        """Get statistics about logged interactions"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
-                SELECT 
-                    COUNT(*) as total_queries,
-                    AVG(response_time_ms) as avg_response_time,
-                    SUM(CASE WHEN error_occurred THEN 1 ELSE 0 END) as total_errors
-                FROM interactions
-            """) as cursor:
-                row = await cursor.fetchone()
-                return {
-                    "total_queries": row[0] or 0,
-                    "avg_response_time_ms": round(row[1] or 0, 2),
-                    "total_errors": row[2] or 0
-                }
+        """
+        Get statistics about logged interactions.
+        Aggregated in SQLite so the numbers stay global across worker
+        processes; the timestamp/error indexes keep this cheap.
+        """
+        async with self._db.execute("""
+            SELECT
+                COUNT(*) as total_queries,
+                AVG(response_time_ms) as avg_response_time,
+                SUM(CASE WHEN error_occurred THEN 1 ELSE 0 END) as total_errors
+            FROM interactions
+        """) as cursor:
+            row = await cursor.fetchone()
+            return {
+                "total_queries": row[0] or 0,
+                "avg_response_time_ms": round(row[1] or 0, 2),
+                "total_errors": row[2] or 0
+            }
@@ -5,7 +5,12 @@ These models ensure type safety and automatic validation.
 
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+def _utc_now() -> datetime:
+    """Timezone-aware replacement for the deprecated datetime.utcnow"""
+    return datetime.now(timezone.utc)
 
 
 class FAQ(BaseModel):
@@ -37,13 +42,13 @@ class QueryResponse(BaseModel):
     answer: str = Field(..., description="AI-generated contextual answer")
     sources: List[RetrievedFAQ] = Field(default_factory=list, description="Retrieved source FAQs")
     response_time_ms: int = Field(..., description="Time taken to generate response")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=_utc_now)
 
 
 class InteractionLog(BaseModel):
     """Log entry for a user interaction"""
     id: Optional[int] = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=_utc_now)
     user_query: str
     retrieved_faq_ids: List[str]
     ai_response: str
@@ -4,63 +4,200 @@ Handles API calls to OpenAI's embedding model with error handling.
 """
 
 from openai import AsyncOpenAI
-from typing import List
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+import asyncio
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
     """Manages text-to-vector conversion using OpenAI embeddings"""
-    
-    def __init__(self, api_key: str, model: str = "text-embedding-3-small"):
-        self.client = AsyncOpenAI(api_key=api_key)
+
+    _CHUNK = 96  # Texts per batch-embedding request (keeps payloads under API limits)
+    _MAX_CONCURRENT_CHUNKS = 8  # Parallel chunk requests (respects rate limits)
+    _MAX_RETRIES = 5  # Attempts per chunk on 429 responses
+    _CACHE_MAXSIZE = 1024  # LRU entries for repeated query embeddings
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-small",
+        max_batch: int = 64,
+        batch_wait_ms: int = 10,
+        http_client=None
+    ):
+        # http_client: optional shared httpx.AsyncClient so all OpenAI
+        # traffic multiplexes over one tuned connection pool
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
         self.model = model
+        self.max_batch = max_batch
+        self.batch_wait_ms = batch_wait_ms
+        # Micro-batch queue: concurrent single-text requests are coalesced
+        # into one OpenAI call by a background worker (started lazily).
+        self._queue: asyncio.Queue[Tuple[str, asyncio.Future]] = None
+        self._batch_worker_task: asyncio.Task = None
+        # LRU cache of query embeddings keyed on normalized text, plus a map
+        # of in-flight lookups so duplicate concurrent queries share one call.
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
         logger.info(f"Initialized EmbeddingService with model: {model}")
-    
-    async def generate_embedding(self, text: str) -> List[float]:
+
+    def _ensure_batch_worker(self):
+        """Start the batching worker on first use (needs a running event loop)."""
+        if self._batch_worker_task is None or self._batch_worker_task.done():
+            self._queue = asyncio.Queue()
+            self._batch_worker_task = asyncio.create_task(self._batch_worker())
+
+    async def _batch_worker(self):
+        """
+        Background loop that drains pending embedding requests.
+        Waits up to batch_wait_ms for more requests to arrive (max_batch cap),
+        then issues a single embeddings.create call for the whole batch and
+        resolves each caller's future with its own vector.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + (self.batch_wait_ms / 1000)
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                response = await self.client.embeddings.create(
+                    model=self.model,
+                    input=texts
+                )
+                for (_, future), item in zip(batch, response.data):
+                    if not future.done():
+                        future.set_result(np.asarray(item.embedding, dtype=np.float32))
+                logger.debug(f"Embedded micro-batch of {len(texts)} texts in one API call")
+            except Exception as e:
+                logger.error(f"Error generating embedding batch: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
         """
         Convert a single text string to vector embedding.
-        
+
+        Repeated queries are served from an LRU cache keyed on normalized
+        text, duplicate in-flight queries share a single API call, and
+        remaining requests from concurrent callers are coalesced by the
+        micro-batch worker, so N simultaneous calls cost one API round-trip
+        instead of N.
+
         Args:
             text: The text to embed
-            
+
         Returns:
-            List of floats representing the embedding vector
-            
+            float32 ndarray representing the embedding vector
+
         Raises:
             Exception: If OpenAI API call fails
         """
+        key = text.strip().lower()
+
+        # Cache hit: skip the API round-trip entirely
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            logger.debug("Embedding cache hit")
+            return cached
+
+        # Identical query already in flight: share its result
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await inflight
+
+        self._ensure_batch_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
         try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            embedding = response.data[0].embedding
-            logger.debug(f"Generated embedding of dimension {len(embedding)}")
-            return embedding
-        except Exception as e:
-            logger.error(f"Error generating embedding: {str(e)}")
-            raise
+            await self._queue.put((text, future))
+            embedding = await future
+        finally:
+            self._inflight.pop(key, None)
+
+        self._cache[key] = embedding
+        if len(self._cache) > self._CACHE_MAXSIZE:
+            self._cache.popitem(last=False)
+
+        logger.debug(f"Generated embedding of dimension {len(embedding)}")
+        return embedding
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def _embed_chunk(self, chunk: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
         """
-        Convert multiple texts to embeddings in a single API call.
-        More efficient than calling generate_embedding multiple times.
-        
+        Embed one chunk of texts, retrying with exponential backoff on
+        rate-limit errors. Concurrency is bounded by the shared semaphore.
+        """
+        async with semaphore:
+            delay = 1.0
+            for attempt in range(self._MAX_RETRIES):
+                try:
+                    response = await self.client.embeddings.create(
+                        model=self.model,
+                        input=chunk
+                    )
+                    return [item.embedding for item in response.data]
+                except Exception as e:
+                    is_rate_limit = getattr(e, "status_code", None) == 429
+                    if not is_rate_limit or attempt == self._MAX_RETRIES - 1:
+                        raise
+                    logger.warning(f"Rate limited embedding chunk, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+    async def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Convert multiple texts to embeddings using concurrent chunked API calls.
+
+        The input is split into chunks of _CHUNK items (OpenAI caps input
+        array size and total tokens per request), sorted by text length so
+        each chunk carries a balanced token load, and the chunks are fired
+        concurrently with asyncio.gather. Results are scattered back into
+        the original order.
+
         Args:
             texts: List of text strings to embed
-            
+
         Returns:
-            List of embedding vectors
+            Contiguous float32 ndarray of shape (len(texts), dimension),
+            rows in the same order as the input texts
         """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
         try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=texts
+            # Sort by length so chunks have balanced token counts
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+            chunks = [
+                [texts[i] for i in order[start:start + self._CHUNK]]
+                for start in range(0, len(order), self._CHUNK)
+            ]
+
+            semaphore = asyncio.Semaphore(self._MAX_CONCURRENT_CHUNKS)
+            chunk_results = await asyncio.gather(
+                *[self._embed_chunk(chunk, semaphore) for chunk in chunks]
             )
-            embeddings = [item.embedding for item in response.data]
-            logger.info(f"Generated {len(embeddings)} embeddings")
+
+            # Scatter results back into the original text order, straight
+            # into one preallocated float32 matrix
+            flat = [embedding for result in chunk_results for embedding in result]
+            embeddings = np.empty((len(texts), len(flat[0])), dtype=np.float32)
+            for original_idx, embedding in zip(order, flat):
+                embeddings[original_idx] = embedding
+
+            logger.info(f"Generated {len(embeddings)} embeddings in {len(chunks)} chunks")
             return embeddings
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {str(e)}")
@@ -4,7 +4,8 @@ Constructs prompts from retrieved FAQs and generates contextual responses.
 """
 
 from openai import AsyncOpenAI
-from typing import List
+from typing import AsyncIterator, List
+import itertools
 import logging
 
 from app.models.schemas import RetrievedFAQ
@@ -12,6 +13,14 @@ from app.models.schemas import RetrievedFAQ
 logger = logging.getLogger(__name__)
 
 
+class FallbackAnswer(str):
+    """
+    Answer produced by the local fallback path after an OpenAI failure.
+    A distinct type so callers can tell transient-failure output apart
+    from real generations (e.g. to skip caching it).
+    """
+
+
 class AnswerGenerator:
     """Generates AI responses using OpenAI's LLM with retrieved context"""
     
@@ -27,16 +36,21 @@ Guidelines:
 - Suggest consulting with a qualified attorney for specific situations"""
     
     def __init__(
-        self, 
-        api_key: str, 
+        self,
+        api_key: str,
         model: str = "gpt-4-turbo-preview",
         temperature: float = 0.7,
-        max_tokens: int = 500
+        max_tokens: int = 500,
+        http_client=None
     ):
-        self.client = AsyncOpenAI(api_key=api_key)
+        # http_client: optional shared httpx.AsyncClient so all OpenAI
+        # traffic multiplexes over one tuned connection pool
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # Built once: the system message is identical for every request
+        self._system_message = {"role": "system", "content": self.SYSTEM_PROMPT}
         logger.info(f"Initialized AnswerGenerator with model: {model}")
     
     def _build_context(self, retrieved_faqs: List[RetrievedFAQ]) -> str:
@@ -51,31 +65,40 @@ Guidelines:
         """
         if not retrieved_faqs:
             return "No relevant FAQs were found in the database."
-        
-        context_parts = ["Here are the relevant FAQs from our database:\n"]
-        for idx, faq in enumerate(retrieved_faqs, 1):
-            context_parts.append(f"\nFAQ {idx} (Category: {faq.category}, Relevance: {faq.similarity_score:.2f}):")
-            context_parts.append(f"Question: {faq.question}")
-            context_parts.append(f"Answer: {faq.answer}")
-        
-        return "\n".join(context_parts)
+
+        # Single join over a generator: one output allocation instead of
+        # growing a list of intermediate fragments per FAQ
+        return "\n".join(itertools.chain(
+            ["Here are the relevant FAQs from our database:\n"],
+            (
+                f"\nFAQ {idx} (Category: {faq.category}, Relevance: {faq.similarity_score:.2f}):"
+                f"\nQuestion: {faq.question}"
+                f"\nAnswer: {faq.answer}"
+                for idx, faq in enumerate(retrieved_faqs, 1)
+            )
+        ))
     
     def _build_user_prompt(self, user_query: str, context: str) -> str:
         """
         Construct the user prompt combining query and context.
-        
+
+        Static instructions and the FAQ context lead the prompt and the
+        user's question comes last, so the prompt prefix stays as stable
+        as possible across requests and stays eligible for OpenAI's
+        automatic prompt caching.
+
         Args:
             user_query: The user's question
             context: Formatted FAQ context
-            
+
         Returns:
             Complete user prompt string
         """
-        return f"""{context}
+        return f"""Please provide a helpful answer based on the FAQ context below. If the context doesn't fully address the question, acknowledge the limitations and recommend consulting with an attorney.
 
-User Question: {user_query}
+{context}
 
-Please provide a helpful answer based on the FAQ context above. If the context doesn't fully address the question, acknowledge the limitations and recommend consulting with an attorney."""
+User Question: {user_query}"""
     
     async def generate_answer(
         self, 
@@ -102,7 +125,7 @@ Please provide a helpful answer based on the FAQ context above. If the context d
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    self._system_message,
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=self.temperature,
@@ -111,13 +134,63 @@ Please provide a helpful answer based on the FAQ context above. If the context d
             
             answer = response.choices[0].message.content
             logger.info(f"Generated answer of length {len(answer)} characters")
+
+            # Verify prompt caching is kicking in for the static prefix
+            usage = response.usage
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) if details else None
+            if cached_tokens is not None:
+                logger.debug(f"Prompt tokens: {usage.prompt_tokens}, cached: {cached_tokens}")
+
             return answer
             
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}")
             # Return fallback message instead of crashing
-            return self._get_fallback_response(retrieved_faqs)
+            return FallbackAnswer(self._get_fallback_response(retrieved_faqs))
     
+    async def generate_answer_stream(
+        self,
+        user_query: str,
+        retrieved_faqs: List[RetrievedFAQ]
+    ) -> AsyncIterator[str]:
+        """
+        Stream the AI response token-by-token as it is generated.
+
+        Yields text fragments as they arrive from OpenAI, so callers can
+        forward them to the client immediately instead of waiting for the
+        full completion. On API failure, yields the fallback response.
+
+        Args:
+            user_query: The user's question
+            retrieved_faqs: FAQs retrieved from vector search
+
+        Yields:
+            Text fragments of the answer, in order
+        """
+        try:
+            context = self._build_context(retrieved_faqs)
+            user_prompt = self._build_user_prompt(user_query, context)
+
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    self._system_message,
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True
+            )
+
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            yield self._get_fallback_response(retrieved_faqs)
+
     def _get_fallback_response(self, retrieved_faqs: List[RetrievedFAQ]) -> str:
         """
         Provide fallback response if OpenAI API fails.
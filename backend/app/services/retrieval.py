@@ -3,141 +3,490 @@ Vector-based FAQ retrieval using Qdrant.
 Handles FAQ indexing and semantic search operations.
 """
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-from typing import List, Dict, Optional
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, Batch, Filter, FieldCondition, MatchValue,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig,
+    SearchParams, QuantizationSearchParams, SearchRequest, PayloadSchemaType,
+    Prefetch
+)
+from typing import List, Dict, Literal, Optional
+from functools import lru_cache
+from pathlib import Path
+import hashlib
 import json
 import logging
+import numpy as np
+import uuid
+
+try:
+    import simsimd
+except ImportError:  # SIMD kernels are optional; NumPy fallback below
+    simsimd = None
 
 from app.models.schemas import FAQ, RetrievedFAQ
 
 logger = logging.getLogger(__name__)
 
+# Fixed namespace for deriving point UUIDs from FAQ ids, so the same FAQ
+# always maps to the same point and re-indexing upserts in place
+_POINT_NAMESPACE = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+
+
+@lru_cache(maxsize=64)
+def _category_filter(category: str) -> Filter:
+    """
+    Build (and cache) the Qdrant filter for a category. The same handful
+    of categories recur on every filtered search, so caching skips the
+    repeated pydantic model construction on the hot path.
+    """
+    return Filter(
+        must=[
+            FieldCondition(
+                key="category",
+                match=MatchValue(value=category)
+            )
+        ]
+    )
+
 
 class FAQRetriever:
     """Manages FAQ storage and retrieval in Qdrant vector database"""
-    
+
+    _UPSERT_BATCH = 256  # Points per upsert call during indexing
+
     def __init__(
-        self, 
-        host: str, 
-        port: int, 
+        self,
+        host: str,
+        port: int,
         collection_name: str,
-        embedding_dimension: int = 1536
+        embedding_dimension: int = 1536,
+        grpc_port: int = 6334,
+        quantization: Literal["none", "int8", "binary"] = "int8"
     ):
-        self.client = QdrantClient(host=host, port=port)
+        # Async client so searches don't block the event loop; gRPC
+        # transport sends vectors as packed protobuf floats instead of JSON
+        self.host = host
+        self.port = port
+        self.client = AsyncQdrantClient(
+            host=host,
+            port=port,
+            grpc_port=grpc_port,
+            prefer_grpc=True
+        )
         self.collection_name = collection_name
         self.embedding_dimension = embedding_dimension
-        logger.info(f"Initialized FAQRetriever connecting to {host}:{port}")
+        self.quantization = quantization
+        # Binary's 1-bit vectors lose more precision, so rescore from a
+        # wider candidate pool than int8 needs
+        self._oversampling = 4.0 if quantization == "binary" else 2.0
+        self._collection_ready = False
+        # Full FAQ content lives here, not in Qdrant payloads: points carry
+        # only faq_id + category, keeping the server's payload cache small.
+        # Persisted to disk so warm restarts have it without re-indexing.
+        self._faq_by_id: Dict[str, FAQ] = {}
+        self._faq_store_path = Path("data") / "faq_store.json"
+        logger.info(f"Initialized FAQRetriever connecting to {host}:{port} (gRPC {grpc_port})")
     
     async def initialize_collection(self):
         """
         Create Qdrant collection if it doesn't exist.
-        Uses cosine distance for similarity measurement.
+        All vectors are L2-normalized before indexing and querying, so DOT
+        distance ranks identically to cosine while skipping the per-vector
+        norm computation during graph traversal. INT8 scalar quantization
+        kept in RAM gives 4x less memory per vector during search, while
+        full-precision rescoring at query time preserves recall.
         """
-        collections = self.client.get_collections().collections
-        collection_exists = any(c.name == self.collection_name for c in collections)
-        
+        if self._collection_ready:
+            return
+
+        try:
+            collection_exists = await self.client.collection_exists(self.collection_name)
+        except AttributeError:
+            # Missing client API is a programming/version error, not a
+            # transport failure - switching to HTTP would just re-raise it
+            raise
+        except Exception as e:
+            # gRPC port unreachable (e.g. not exposed); drop back to HTTP
+            logger.warning(f"gRPC transport unavailable ({e}), falling back to HTTP")
+            self.client = AsyncQdrantClient(host=self.host, port=self.port)
+            collection_exists = await self.client.collection_exists(self.collection_name)
+
         if not collection_exists:
-            self.client.create_collection(
+            await self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.embedding_dimension,
-                    distance=Distance.COSINE
-                )
+                    distance=Distance.DOT
+                ),
+                quantization_config=self._quantization_config()
+            )
+            # Keyword index on category so filtered searches traverse a
+            # prefilter bitmap instead of scanning payloads during HNSW
+            await self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="category",
+                field_schema=PayloadSchemaType.KEYWORD
             )
             logger.info(f"Created collection: {self.collection_name}")
         else:
             logger.info(f"Collection {self.collection_name} already exists")
+            await self._reconcile_quantization_mode()
+
+        # Fire one dummy query so Qdrant pre-faults the HNSW graph pages
+        # into RAM now, instead of the first real request paying the cold
+        # p99 cliff after boot
+        try:
+            await self.client.query_points(
+                collection_name=self.collection_name,
+                query=[0.0] * self.embedding_dimension,
+                limit=1
+            )
+            logger.info("Warmed up collection with a dummy query")
+        except AttributeError:
+            # A missing API must fail loudly, not log as a warm-up hiccup
+            raise
+        except Exception as e:
+            logger.warning(f"Collection warm-up query failed: {str(e)}")
+
+        self._collection_ready = True
+        self._load_faq_store()
+
+    async def _reconcile_quantization_mode(self):
+        """
+        Align the configured quantization mode with what the existing
+        collection actually uses. Quantization is only applied at
+        collection creation, so a changed setting would otherwise be
+        silently ignored while searches send rescoring params tuned for
+        the wrong mode.
+        """
+        try:
+            info = await self.client.get_collection(self.collection_name)
+            live_config = info.config.quantization_config
+        except Exception as e:
+            logger.warning(f"Could not inspect quantization config: {str(e)}")
+            return
+
+        if live_config is None:
+            live_mode = "none"
+        elif getattr(live_config, "scalar", None) is not None:
+            live_mode = "int8"
+        elif getattr(live_config, "binary", None) is not None:
+            live_mode = "binary"
+        else:
+            live_mode = "none"
+
+        if live_mode != self.quantization:
+            logger.warning(
+                "Collection %s uses %s quantization but %s is configured; "
+                "honoring %s until the collection is recreated",
+                self.collection_name, live_mode, self.quantization, live_mode
+            )
+            self.quantization = live_mode
+            self._oversampling = 4.0 if live_mode == "binary" else 2.0
+
+    def _quantization_config(self):
+        """Quantization config for collection creation, per the configured mode"""
+        if self.quantization == "int8":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        if self.quantization == "binary":
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=True)
+            )
+        return None
+
+    def _quantization_search_params(self) -> Optional[SearchParams]:
+        """Rescoring params matching the configured quantization mode"""
+        if self.quantization == "none":
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=self._oversampling
+            )
+        )
+
+    def _load_faq_store(self):
+        """
+        Load the persisted FAQ content store. When no persisted copy
+        exists but the collection does (e.g. the Qdrant volume survived a
+        container rebuild that wiped the app's data directory), rebuild
+        the store from the bundled FAQ file so lookups keep working.
+        """
+        if self._faq_store_path.exists():
+            faq_data = json.loads(self._faq_store_path.read_text())
+            self._faq_by_id = {faq["id"]: FAQ(**faq) for faq in faq_data}
+            logger.info(f"Loaded {len(self._faq_by_id)} FAQs from {self._faq_store_path}")
+            return
+
+        bundled_path = Path(__file__).resolve().parent.parent / "data" / "legal_faqs.json"
+        if bundled_path.exists():
+            faq_data = json.loads(bundled_path.read_text())["faqs"]
+            self._faq_by_id = {faq["id"]: FAQ(**faq) for faq in faq_data}
+            self._save_faq_store()
+            logger.info(f"Rebuilt FAQ store from bundled {bundled_path.name} ({len(self._faq_by_id)} FAQs)")
+
+    def _save_faq_store(self):
+        """Persist the FAQ content store for warm restarts"""
+        self._faq_store_path.parent.mkdir(parents=True, exist_ok=True)
+        self._faq_store_path.write_text(
+            json.dumps([faq.model_dump() for faq in self._faq_by_id.values()])
+        )
     
-    async def index_faqs(self, faqs: List[FAQ], embeddings: List[List[float]]):
+    async def index_faqs(self, faqs: List[FAQ], embeddings: np.ndarray):
         """
         Store FAQs with their embeddings in Qdrant.
-        
+
+        Points are upserted in batches of _UPSERT_BATCH with wait=False so
+        server-side indexing pipelines behind the next batch, and only the
+        final batch waits for completion to guarantee everything landed.
+
         Args:
             faqs: List of FAQ objects
-            embeddings: Corresponding embedding vectors
+            embeddings: float32 matrix of shape (len(faqs), dimension)
         """
         if len(faqs) != len(embeddings):
             raise ValueError("Number of FAQs must match number of embeddings")
-        
-        points = []
-        for idx, (faq, embedding) in enumerate(zip(faqs, embeddings)):
-            point = PointStruct(
-                id=idx,
-                vector=embedding,
-                payload={
-                    "faq_id": faq.id,
-                    "question": faq.question,
-                    "answer": faq.answer,
-                    "category": faq.category,
-                    "keywords": faq.keywords
-                }
+
+        # One contiguous float32 matrix instead of nested Python lists:
+        # ~7x less memory and sequential access on the serialize path
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.shape != (len(faqs), self.embedding_dimension):
+            raise ValueError(
+                f"Expected embeddings of shape {(len(faqs), self.embedding_dimension)}, "
+                f"got {embeddings.shape}"
             )
-            points.append(point)
-        
-        self.client.upsert(
+
+        # L2-normalize in place so DOT distance matches cosine ranking
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+        # Keep full content locally; points store only what search needs
+        self._faq_by_id = {faq.id: faq for faq in faqs}
+        self._save_faq_store()
+
+        total = len(faqs)
+        for start in range(0, total, self._UPSERT_BATCH):
+            end = min(start + self._UPSERT_BATCH, total)
+            batch_faqs = faqs[start:end]
+            await self.client.upsert(
+                collection_name=self.collection_name,
+                # Columnar Batch instead of per-point PointStructs: one
+                # bulk conversion of the vector slice and no per-point
+                # pydantic model construction
+                points=Batch(
+                    # Deterministic IDs from the FAQ id: re-indexing the
+                    # same FAQ overwrites its point instead of duplicating
+                    # it, and additions never disturb existing points
+                    ids=[str(uuid.uuid5(_POINT_NAMESPACE, faq.id)) for faq in batch_faqs],
+                    vectors=embeddings[start:end].tolist(),
+                    payloads=[
+                        {
+                            "faq_id": faq.id,
+                            "category": faq.category,
+                            "content_hash": hashlib.sha256(
+                                f"{faq.question}\x00{faq.answer}".encode()
+                            ).hexdigest()[:16]
+                        }
+                        for faq in batch_faqs
+                    ]
+                ),
+                wait=(end == total)
+            )
+        logger.info("Indexed %d FAQs into Qdrant", total)
+    
+    @staticmethod
+    def _normalize_query(query_embedding) -> List[float]:
+        """
+        L2-normalize a query vector and unbox it to the list the pydantic
+        request models require. Normalizing here keeps DOT-distance
+        rankings identical to cosine.
+        """
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        vector = vector / np.linalg.norm(vector)
+        return vector.tolist()
+
+    def _to_retrieved(self, result) -> RetrievedFAQ:
+        """
+        Map one Qdrant scored point to a RetrievedFAQ.
+        Question and answer text come from the local FAQ store; the payload
+        only identifies the FAQ. Falls back to payload fields for points
+        indexed before the payload was slimmed down.
+
+        Uses model_construct to skip pydantic validation: both the FAQ
+        store and Qdrant scores are trusted internal data.
+        """
+        payload = result.payload
+        faq = self._faq_by_id.get(payload["faq_id"])
+        if faq is not None:
+            return RetrievedFAQ.model_construct(
+                faq_id=faq.id,
+                question=faq.question,
+                answer=faq.answer,
+                category=faq.category,
+                similarity_score=result.score
+            )
+        # Slimmed payloads don't carry content; never KeyError on a store
+        # miss, just surface a degraded result and flag it in the logs
+        logger.warning("FAQ %s missing from local store; serving degraded result", payload["faq_id"])
+        return RetrievedFAQ.model_construct(
+            faq_id=payload["faq_id"],
+            question=payload.get("question", ""),
+            answer=payload.get("answer", "This FAQ's content is temporarily unavailable."),
+            category=payload.get("category", "Unknown"),
+            similarity_score=result.score
+        )
+
+    async def search_many(
+        self,
+        query_embeddings: List[np.ndarray],
+        top_k: int = 2,
+        score_threshold: float = 0.7,
+        category_filter: Optional[str] = None
+    ) -> List[List[RetrievedFAQ]]:
+        """
+        Search for similar FAQs for multiple queries in one round-trip.
+
+        All queries go through a single search_batch call, amortizing the
+        network round-trip and filter serialization across the batch.
+
+        Args:
+            query_embeddings: Vector representations of the user queries
+            top_k: Number of results to return per query
+            score_threshold: Minimum similarity score (0-1)
+            category_filter: Optional category to filter results
+
+        Returns:
+            One list of RetrievedFAQ objects per query, in input order
+        """
+        query_filter = _category_filter(category_filter) if category_filter else None
+
+        requests = [
+            SearchRequest(
+                vector=self._normalize_query(query_embedding),
+                limit=top_k,
+                score_threshold=score_threshold,
+                filter=query_filter,
+                # Threshold filtering happens inside Qdrant; return payloads
+                # but skip the vectors we never read
+                with_payload=True,
+                with_vector=False,
+                # Search the quantized vectors, then rescore the oversampled
+                # candidate set with full-precision vectors to preserve accuracy
+                params=self._quantization_search_params()
+            )
+            for query_embedding in query_embeddings
+        ]
+
+        batch_results = await self.client.search_batch(
             collection_name=self.collection_name,
-            points=points
+            requests=requests
         )
-        logger.info(f"Indexed {len(points)} FAQs into Qdrant")
-    
+
+        retrieved = [
+            [self._to_retrieved(result) for result in results]
+            for results in batch_results
+        ]
+        # %-style args defer formatting until the record is actually emitted
+        logger.info(
+            "Retrieved FAQs for %d queries with scores above %.2f",
+            len(retrieved), score_threshold
+        )
+        return retrieved
+
     async def search(
-        self, 
-        query_embedding: List[float], 
+        self,
+        query_embedding: np.ndarray,
         top_k: int = 2,
         score_threshold: float = 0.7,
         category_filter: Optional[str] = None
     ) -> List[RetrievedFAQ]:
         """
         Search for similar FAQs using vector similarity.
-        
+
+        Uses the query_points API with a prefetch stage: the prefetch
+        recalls top_k*4 candidates cheaply from the quantized index, and
+        the outer query rescores that oversampled set, all in a single
+        round-trip.
+
         Args:
             query_embedding: Vector representation of user query
             top_k: Number of results to return
             score_threshold: Minimum similarity score (0-1)
             category_filter: Optional category to filter results
-            
+
         Returns:
             List of RetrievedFAQ objects with similarity scores
         """
-        search_params = {
-            "collection_name": self.collection_name,
-            "query_vector": query_embedding,
-            "limit": top_k,
-            "score_threshold": score_threshold
-        }
-        
-        # Add category filter if specified
-        if category_filter:
-            search_params["query_filter"] = Filter(
-                must=[
-                    FieldCondition(
-                        key="category",
-                        match=MatchValue(value=category_filter)
-                    )
-                ]
-            )
-        
-        results = self.client.search(**search_params)
-        
-        retrieved_faqs = []
-        for result in results:
-            faq = RetrievedFAQ(
-                faq_id=result.payload["faq_id"],
-                question=result.payload["question"],
-                answer=result.payload["answer"],
-                category=result.payload["category"],
-                similarity_score=result.score
-            )
-            retrieved_faqs.append(faq)
-        
-        logger.info(f"Retrieved {len(retrieved_faqs)} FAQs with scores above {score_threshold}")
+        query_embedding = self._normalize_query(query_embedding)
+        query_filter = _category_filter(category_filter) if category_filter else None
+
+        response = await self.client.query_points(
+            collection_name=self.collection_name,
+            prefetch=[
+                Prefetch(
+                    query=query_embedding,
+                    limit=top_k * 4,
+                    filter=query_filter,
+                    params=self._quantization_search_params()
+                )
+            ],
+            query=query_embedding,
+            limit=top_k,
+            score_threshold=score_threshold,
+            with_payload=True,
+            with_vectors=False
+        )
+
+        retrieved_faqs = [self._to_retrieved(result) for result in response.points]
+        logger.info("Retrieved %d FAQs with scores above %.2f", len(retrieved_faqs), score_threshold)
         return retrieved_faqs
     
-    def get_faq_count(self) -> int:
-        """Return the total number of FAQs in the collection"""
+    def local_rerank(self, query_embedding, candidate_vecs) -> np.ndarray:
+        """
+        Score candidates against a query by cosine similarity in-process.
+
+        Uses SimSIMD's vectorized kernels when available (orders of
+        magnitude faster than per-pair Python dot products), falling back
+        to a single NumPy matrix product otherwise. Useful for exact
+        rescoring of a shortlist on top of Qdrant's approximate results.
+
+        Args:
+            query_embedding: Query vector of shape (D,)
+            candidate_vecs: Candidate matrix of shape (N, D)
+
+        Returns:
+            float array of N cosine similarity scores
+        """
+        query = np.ascontiguousarray(query_embedding, dtype=np.float32)
+        candidates = np.ascontiguousarray(candidate_vecs, dtype=np.float32)
+
+        if simsimd is not None:
+            distances = np.asarray(
+                simsimd.cdist(query[None, :], candidates, metric="cosine")
+            )[0]
+            return 1.0 - distances
+
+        norms = np.linalg.norm(candidates, axis=1) * np.linalg.norm(query)
+        return (candidates @ query) / norms
+
+    async def get_faq_count(self, exact: bool = False) -> int:
+        """
+        Return the number of FAQs in the collection.
+
+        Defaults to Qdrant's O(1) approximate count, which is plenty for
+        health probes and stats; pass exact=True where a precise number
+        matters.
+        """
         try:
-            collection_info = self.client.get_collection(self.collection_name)
-            return collection_info.points_count
-        except Exception:
+            result = await self.client.count(self.collection_name, exact=exact)
+            return result.count
+        except Exception as e:
+            logger.warning(f"Failed to count FAQs in {self.collection_name}: {str(e)}")
             return 0